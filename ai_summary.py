@@ -6,7 +6,13 @@ from string import punctuation
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def generate_ai_summary(query, results, max_results=5):
+def _page_content(result, page_contents):
+    """Return the extracted page text for a result, or None if there is none"""
+    if not page_contents:
+        return None
+    return page_contents.get(result.get('link')) or None
+
+def generate_ai_summary(query, results, max_results=5, page_contents=None):
     """
     Generate a summary of search results using local extractive summarization techniques
     
@@ -14,6 +20,7 @@ def generate_ai_summary(query, results, max_results=5):
         query (str): The search query
         results (list): List of search result dictionaries
         max_results (int): Maximum number of results to use for the summary
+        page_contents (dict): Optional extracted page text keyed by result link
     
     Returns:
         str: Generated summary or None if an error occurs
@@ -25,11 +32,12 @@ def generate_ai_summary(query, results, max_results=5):
         if not used_results:
             return None
         
-        # Step 1: Collect all text from snippets
+        # Step 1: Collect all text from page contents or snippets
         all_text = ""
         for result in used_results:
-            if result.get('snippet'):
-                all_text += result.get('snippet', '') + " "
+            text = _page_content(result, page_contents) or result.get('snippet', '')
+            if text:
+                all_text += text + " "
         
         # Step 2: Clean text
         all_text = all_text.lower()
@@ -65,10 +73,19 @@ def generate_ai_summary(query, results, max_results=5):
             if word in query_words or any(query_word in word for query_word in query_words):
                 word_freq[word] *= 3
         
-        # Step 4: Extract most informative sentences from snippets
+        # Step 4: Extract most informative sentences from page contents or snippets
         sentences = []
         for result in used_results:
-            if result.get('snippet'):
+            content = _page_content(result, page_contents)
+            if content:
+                # Extracted pages also break on paragraphs (headings, list items)
+                content_sentences = re.split(r'(?<=[.!?])\s+|\n+', content)
+                for sentence in content_sentences:
+                    sentence = sentence.strip()
+                    # Ignore very short sentences and run-on blocks that aren't really sentences
+                    if 20 < len(sentence) <= 400:
+                        sentences.append(sentence)
+            elif result.get('snippet'):
                 # Split snippet into sentences (simple approach)
                 snippet_sentences = re.split(r'(?<=[.!?])\s+', result.get('snippet', ''))
                 for sentence in snippet_sentences:
@@ -3,6 +3,7 @@ import logging
 from flask import Flask, render_template, request, jsonify
 from search_engine import search_all_engines, get_available_engines
 from ai_summary import generate_ai_summary
+from content_enricher import ENRICHMENT_ENABLED, enrich_in_background
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -16,6 +17,10 @@ app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
 # Format: {query: {'results': [...], 'timestamp': time.time()}}
 search_cache = {}
 
+# Cache keys whose enrichment was skipped because all enrichment slots were busy;
+# a later cache hit for the key tries again
+skipped_enrichment = set()
+
 @app.route('/')
 def index():
     """Render the main search page"""
@@ -62,7 +67,17 @@ def api_search():
         cache_key = f"{query}:{','.join(sorted(engines))}:{page}"
         if cache_key in search_cache:
             logger.debug(f"Returning cached results for '{query}'")
-            return jsonify(search_cache[cache_key])
+            results = search_cache[cache_key]
+            
+            # set.remove is atomic, so only one concurrent hit retries the enrichment
+            try:
+                skipped_enrichment.remove(cache_key)
+            except KeyError:
+                pass
+            else:
+                start_enrichment(cache_key, query, results)
+            
+            return jsonify(results)
         
         # If not in cache, perform the search
         results = search_all_engines(query, engines, page)
@@ -74,6 +89,14 @@ def api_search():
                 results['ai_summary'] = ai_summary
                 logger.info(f"Generated summary for query: '{query}'")
         
+        # Refine the summary from full page content without holding up this response;
+        # the flags are set before caching so every cache hit sees them
+        if ENRICHMENT_ENABLED and results.get('all_results'):
+            results['summary_pending'] = False
+            results['summary_enriched'] = False
+            results.setdefault('ai_summary', None)
+            start_enrichment(cache_key, query, results)
+        
         # Cache the results
         search_cache[cache_key] = results
         
@@ -83,6 +106,7 @@ def api_search():
             keys_to_remove = list(search_cache.keys())[:20]
             for key in keys_to_remove:
                 search_cache.pop(key, None)
+                skipped_enrichment.discard(key)
                 
         return jsonify(results)
     
@@ -90,6 +114,52 @@ def api_search():
         logger.error(f"Error searching for '{query}': {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def start_enrichment(cache_key, query, results):
+    """Start background enrichment for a search, or remember it for retry if all slots are busy"""
+    results['summary_pending'] = True
+    started = enrich_in_background(
+        results['all_results'],
+        lambda page_contents: update_enriched_summary(query, results, page_contents)
+    )
+    if not started:
+        results['summary_pending'] = False
+        skipped_enrichment.add(cache_key)
+    return started
+
+def update_enriched_summary(query, results, page_contents):
+    """Replace the cached snippet summary with one built from extracted page content"""
+    try:
+        if page_contents:
+            ai_summary = generate_ai_summary(query, results['all_results'], page_contents=page_contents)
+            if ai_summary:
+                results['ai_summary'] = ai_summary
+                results['summary_enriched'] = True
+                logger.info(f"Generated enriched summary for query: '{query}' from {len(page_contents)} pages")
+    finally:
+        # Always clear the flag so clients stop polling
+        results['summary_pending'] = False
+
+@app.route('/api/summary')
+def api_summary():
+    """API endpoint to get the (possibly enriched) summary for a cached search"""
+    query = request.args.get('q', '')
+    page = request.args.get('page', 1, type=int)
+    engines = request.args.getlist('engines') or get_available_engines()
+    
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    cache_key = f"{query}:{','.join(sorted(engines))}:{page}"
+    results = search_cache.get(cache_key)
+    if results is None:
+        return jsonify({'error': 'No cached search for this query'}), 404
+    
+    return jsonify({
+        'ai_summary': results.get('ai_summary'),
+        'summary_pending': results.get('summary_pending', False),
+        'summary_enriched': results.get('summary_enriched', False)
+    })
+
 @app.route('/about')
 def about():
     """Render the about me page"""
@@ -0,0 +1,375 @@
+import os
+import time
+import socket
+import logging
+import threading
+import ipaddress
+import http.cookiejar
+import urllib.parse
+import requests
+import urllib3
+import trafilatura
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait
+from search_engine import get_random_user_agent
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Enrichment is off unless explicitly enabled
+ENRICHMENT_ENABLED = os.environ.get("ENABLE_CONTENT_ENRICHMENT", "").lower() in ('1', 'true', 'yes')
+
+# Budgets for a single enrichment run
+#
+# Each redirect hop starts only before the deadline, with its connect and read timeouts
+# clipped to the time left, and the body loop checks the deadline before every read. So
+# once the deadline passes, a fetch thread finishes at most the socket operation it is in,
+# i.e. up to READ_TIMEOUT more. Not covered: DNS lookups (for the public-address check and
+# the connection itself), a server that drips response headers (each header read gets its
+# own read timeout) and trafilatura's extraction of a page already read. The run's job slot
+# is held until its fetch threads stop, so slow fetches reduce how many runs can start
+# rather than starving later runs.
+MAX_PAGES = 5                   # Only the top-N results are fetched
+MAX_CONCURRENT_FETCHES = 5      # Parallel page downloads per run
+MAX_PAGE_BYTES = 512 * 1024     # Stop reading a page after this many bytes
+MAX_TOTAL_BYTES = 2 * 1024 * 1024  # Stop reading all pages after this many bytes
+MAX_CONTENT_CHARS = 5000        # Extracted text kept per page
+CONNECT_TIMEOUT = 2             # Seconds to establish a connection
+READ_TIMEOUT = 3                # Seconds to wait between bytes
+TOTAL_TIME_BUDGET = 6           # Seconds for the whole run, wall clock
+CHUNK_SIZE = 4 * 1024           # Upper bound on a single read; the deadline is checked before each
+MAX_REDIRECTS = 3               # Redirect hops followed per page
+
+# Limit on enrichment runs in flight; extra requests are skipped, never queued
+MAX_BACKGROUND_JOBS = 2
+
+# In-memory cache for extracted page content
+# Format: {canonical_url: {'content': str or None, 'timestamp': time.time(), 'ttl': seconds}}
+CONTENT_CACHE_TTL = 60 * 60
+NEGATIVE_CACHE_TTL = 5 * 60     # Failed pages are retried much sooner
+CONTENT_CACHE_MAX_SIZE = 500
+content_cache = {}
+_cache_lock = threading.Lock()
+
+# Why fetch_page stopped reading a page
+FETCH_COMPLETE = 'complete'     # Whole page read, or stopped at MAX_PAGE_BYTES
+FETCH_INCOMPLETE = 'incomplete' # Cut short by this run's time or total byte budget
+FETCH_FAILED = 'failed'         # Request error, bad status or non-HTML response
+
+# Query parameters that only track the visitor and don't change the page
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'msclkid', 'mc_cid', 'mc_eid')
+
+# Shared session so connections are pooled and reused across fetches; cookies are
+# refused so nothing from one site or one user's query is stored or sent back later
+_session = requests.Session()
+_session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+_adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_FETCHES * 2,
+                       pool_maxsize=MAX_CONCURRENT_FETCHES * MAX_BACKGROUND_JOBS)
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+_job_executor = ThreadPoolExecutor(max_workers=MAX_BACKGROUND_JOBS)
+_job_slots = threading.BoundedSemaphore(MAX_BACKGROUND_JOBS)
+
+
+def canonicalize_url(url):
+    """Normalize a URL so the same page always maps to the same cache key"""
+    parsed = urllib.parse.urlsplit(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+
+    # Drop default ports
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+
+    # Drop tracking parameters and sort the rest
+    query_params = [
+        (key, value) for key, value in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ]
+    query = urllib.parse.urlencode(sorted(query_params))
+
+    path = parsed.path or '/'
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ''))
+
+
+def get_cached_content(canonical_url):
+    """Return (hit, content) for a cached page, ignoring expired entries"""
+    with _cache_lock:
+        entry = content_cache.get(canonical_url)
+        if entry is None:
+            return False, None
+        if time.time() - entry['timestamp'] > entry['ttl']:
+            content_cache.pop(canonical_url, None)
+            return False, None
+        return True, entry['content']
+
+
+def cache_content(canonical_url, content):
+    """Store extracted content (or None for a failed page) in the cache"""
+    ttl = CONTENT_CACHE_TTL if content else NEGATIVE_CACHE_TTL
+    with _cache_lock:
+        content_cache[canonical_url] = {'content': content, 'timestamp': time.time(), 'ttl': ttl}
+
+        # Clean up cache if it gets too large (oldest entries first)
+        if len(content_cache) > CONTENT_CACHE_MAX_SIZE:
+            keys_to_remove = list(content_cache.keys())[:CONTENT_CACHE_MAX_SIZE // 5]
+            for key in keys_to_remove:
+                content_cache.pop(key, None)
+
+
+class _ByteBudget:
+    """Byte allowance shared by all fetches in one enrichment run"""
+
+    def __init__(self, limit):
+        self.remaining = limit
+        self._lock = threading.Lock()
+
+    def take(self, size):
+        """Reserve up to `size` bytes and return how many were granted"""
+        with self._lock:
+            granted = min(size, self.remaining)
+            self.remaining -= granted
+            return granted
+
+
+def _read_chunks(response):
+    """Yield the response body one socket read at a time where urllib3 supports it"""
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is None:
+        # Older urllib3: each chunk may take several reads, so the overrun is a few READ_TIMEOUTs
+        yield from response.iter_content(chunk_size=CHUNK_SIZE)
+        return
+
+    while True:
+        chunk = read1(CHUNK_SIZE, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _is_public_url(url):
+    """
+    Return True if url is http(s) and its host resolves only to public addresses
+
+    The connection resolves the host again, so a DNS server that answers differently
+    the second time can still get past this; it stops plain redirects and links into
+    internal networks.
+    """
+    try:
+        parsed = urllib.parse.urlsplit(url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    except ValueError:
+        return False
+
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return False
+
+    try:
+        addresses = socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)
+    except OSError:
+        return False
+
+    for address in addresses:
+        ip = ipaddress.ip_address(address[4][0].split('%', 1)[0])
+        if (ip.is_loopback or ip.is_private or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified or not ip.is_global):
+            return False
+    return bool(addresses)
+
+
+def _read_body(response, url, deadline, byte_budget):
+    """Read a streamed response body up to the page, run byte and time caps"""
+    chunks = []
+    received = 0
+    status = FETCH_COMPLETE
+    for chunk in _read_chunks(response):
+        if time.monotonic() > deadline:
+            logger.debug(f"Time budget exhausted while reading {url}")
+            status = FETCH_INCOMPLETE
+            break
+
+        wanted = min(len(chunk), MAX_PAGE_BYTES - received)
+        allowed = byte_budget.take(wanted)
+        if allowed > 0:
+            chunks.append(chunk[:allowed])
+            received += allowed
+        if allowed < wanted:
+            logger.debug(f"Byte budget exhausted while reading {url}")
+            status = FETCH_INCOMPLETE
+            break
+        if received >= MAX_PAGE_BYTES:
+            break
+
+    return (b''.join(chunks) if chunks else None), status
+
+
+def fetch_page(url, deadline, byte_budget):
+    """
+    Download a page with a streaming read that stops at the byte and time caps
+
+    Redirects are followed by hand (at most MAX_REDIRECTS) so every hop is checked
+    against _is_public_url and the deadline before it is requested.
+
+    Returns:
+        tuple: (html bytes or None, one of FETCH_COMPLETE, FETCH_INCOMPLETE or FETCH_FAILED)
+    """
+    headers = {
+        'User-Agent': get_random_user_agent(),
+        'Accept': 'text/html,application/xhtml+xml',
+        'Accept-Language': 'en-US,en;q=0.9'
+    }
+
+    current_url = url
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None, FETCH_INCOMPLETE
+
+            if not _is_public_url(current_url):
+                logger.debug(f"Refusing to fetch non-public URL {current_url} (from {url})")
+                return None, FETCH_FAILED
+
+            with _session.get(current_url, headers=headers, stream=True, allow_redirects=False,
+                              timeout=(min(CONNECT_TIMEOUT, remaining), min(READ_TIMEOUT, remaining))) as response:
+                if response.is_redirect:
+                    current_url = urllib.parse.urljoin(current_url, response.headers['Location'])
+                    continue
+
+                response.raise_for_status()
+
+                content_type = response.headers.get('Content-Type', '')
+                if 'html' not in content_type.lower():
+                    logger.debug(f"Skipping non-HTML page {current_url} ({content_type})")
+                    return None, FETCH_FAILED
+
+                return _read_body(response, current_url, deadline, byte_budget)
+
+        logger.debug(f"Too many redirects fetching {url}")
+        return None, FETCH_FAILED
+
+    except (requests.RequestException, urllib3.exceptions.HTTPError, OSError) as e:
+        # Raw urllib3 reads raise their own exceptions rather than requests ones
+        logger.debug(f"Error fetching page {url}: {str(e)}")
+
+        # Timeouts are clipped to the run's deadline, so one at the deadline is the budget, not the page
+        timed_out = isinstance(e, (requests.Timeout, urllib3.exceptions.TimeoutError, socket.timeout))
+        if timed_out and time.monotonic() >= deadline:
+            return None, FETCH_INCOMPLETE
+        return None, FETCH_FAILED
+
+
+def extract_main_text(html):
+    """Extract the main article text from raw HTML"""
+    try:
+        text = trafilatura.extract(html, include_comments=False, include_tables=False, favor_precision=True)
+    except Exception as e:
+        logger.debug(f"Error extracting page content: {str(e)}")
+        return None
+
+    if not text:
+        return None
+    return text[:MAX_CONTENT_CHARS]
+
+
+def _fetch_and_extract(url, canonical_url, deadline, byte_budget):
+    """Fetch one page, extract its text and cache the outcome if the page was read in full"""
+    if time.monotonic() > deadline:
+        return None
+
+    html, status = fetch_page(url, deadline, byte_budget)
+    content = extract_main_text(html) if html else None
+
+    # Pages cut short by this run's budget are used once but not cached, so a later run can read them in full
+    if status != FETCH_INCOMPLETE:
+        cache_content(canonical_url, content)
+    return content
+
+
+def fetch_page_contents(results, executor, max_pages=MAX_PAGES):
+    """
+    Fetch and extract the main text of the top results within the enrichment budgets
+
+    Returns at the deadline even if some fetches are still running; the caller owns
+    the executor and should shut it down to wait for them.
+
+    Args:
+        results (list): List of search result dictionaries
+        executor (ThreadPoolExecutor): Pool reserved for this run's page fetches
+        max_pages (int): Maximum number of result pages to fetch
+
+    Returns:
+        dict: Extracted text keyed by result link; pages that failed or ran out of budget are omitted
+    """
+    deadline = time.monotonic() + TOTAL_TIME_BUDGET
+    byte_budget = _ByteBudget(MAX_TOTAL_BYTES)
+    page_contents = {}
+    future_to_link = {}
+
+    for result in results[:max_pages]:
+        link = result.get('link')
+        if not link:
+            continue
+
+        try:
+            canonical_url = canonicalize_url(link)
+        except ValueError as e:
+            logger.debug(f"Skipping malformed link {link}: {str(e)}")
+            continue
+
+        hit, content = get_cached_content(canonical_url)
+        if hit:
+            if content:
+                page_contents[link] = content
+            continue
+
+        future = executor.submit(_fetch_and_extract, link, canonical_url, deadline, byte_budget)
+        future_to_link[future] = link
+
+    if future_to_link:
+        done, _ = wait(future_to_link, timeout=max(0, deadline - time.monotonic()))
+        for future in done:
+            try:
+                content = future.result()
+            except Exception as e:
+                logger.error(f"Error enriching {future_to_link[future]}: {str(e)}")
+                continue
+            if content:
+                page_contents[future_to_link[future]] = content
+
+    logger.debug(f"Enriched {len(page_contents)} of {min(len(results), max_pages)} pages")
+    return page_contents
+
+
+def enrich_in_background(results, callback, max_pages=MAX_PAGES):
+    """
+    Run fetch_page_contents off the request thread and pass its output to callback
+
+    The callback is always called exactly once, with an empty dict if enrichment fails.
+
+    Returns:
+        bool: True if the job was started, False if enrichment is busy and the request was skipped
+    """
+    if not _job_slots.acquire(blocking=False):
+        logger.debug("Enrichment skipped: too many jobs in flight")
+        return False
+
+    def job():
+        executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES)
+        try:
+            try:
+                page_contents = fetch_page_contents(results, executor, max_pages)
+            except Exception as e:
+                logger.error(f"Error in background enrichment: {str(e)}")
+                page_contents = {}
+            callback(page_contents)
+        except Exception as e:
+            logger.error(f"Error in enrichment callback: {str(e)}")
+        finally:
+            # Keep the job slot until this run's fetches have actually stopped
+            executor.shutdown(wait=True, cancel_futures=True)
+            _job_slots.release()
+
+    _job_executor.submit(job)
+    return True
@@ -16,6 +16,9 @@ document.addEventListener('DOMContentLoaded', function() {
     const aiSummaryContainer = document.getElementById('ai-summary-container');
     const aiSummaryContent = document.getElementById('ai-summary-content');
 
+    // Bumped on every load so summary polls from an earlier page or search stop
+    let loadGeneration = 0;
+
     // Load search results when the page loads
     loadSearchResults();
 
@@ -38,6 +41,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Function to load search results
     function loadSearchResults() {
+        const generation = ++loadGeneration;
+        
         // Show loading indicator
         loadingIndicator.classList.remove('d-none');
         
@@ -77,6 +82,11 @@ document.addEventListener('DOMContentLoaded', function() {
                 // Display results
                 displayResults(data);
                 
+                // Pick up the page-content summary once the server has built it
+                if (data.summary_pending) {
+                    pollEnrichedSummary(apiUrl.replace('/api/search', '/api/summary'), 0, generation);
+                }
+                
                 // Show pagination if we have results
                 if (data.all_results && data.all_results.length > 0) {
                     paginationContainer.classList.remove('d-none');
@@ -105,6 +115,50 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
 
+    // Function to show the summary as plain text (it is built from third-party page content)
+    function showSummary(summary) {
+        const paragraph = document.createElement('p');
+        paragraph.textContent = summary;
+        aiSummaryContent.replaceChildren(paragraph);
+        aiSummaryContainer.classList.remove('d-none');
+    }
+
+    // Function to poll for the enriched summary (gives up after a few attempts)
+    function pollEnrichedSummary(summaryUrl, attempt, generation) {
+        if (attempt >= 5) {
+            return;
+        }
+        
+        setTimeout(function() {
+            if (generation !== loadGeneration) {
+                return;
+            }
+            
+            fetch(summaryUrl)
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error('Network response was not ok');
+                    }
+                    return response.json();
+                })
+                .then(data => {
+                    // A newer page or search has been loaded since this poll started
+                    if (generation !== loadGeneration) {
+                        return;
+                    }
+                    
+                    if (data.summary_enriched && data.ai_summary) {
+                        showSummary(data.ai_summary);
+                    } else if (data.summary_pending) {
+                        pollEnrichedSummary(summaryUrl, attempt + 1, generation);
+                    }
+                })
+                .catch(error => {
+                    console.error('Error fetching enriched summary:', error);
+                });
+        }, 1500);
+    }
+
     // Function to display search results
     function displayResults(data) {
         // Update stats
@@ -114,8 +168,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Display AI summary if available
         if (data.ai_summary) {
-            aiSummaryContent.innerHTML = `<p>${data.ai_summary}</p>`;
-            aiSummaryContainer.classList.remove('d-none');
+            showSummary(data.ai_summary);
         } else {
             aiSummaryContainer.classList.add('d-none');
         }
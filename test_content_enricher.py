@@ -0,0 +1,192 @@
+import time
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import content_enricher
+from content_enricher import (
+    FETCH_COMPLETE, FETCH_INCOMPLETE, FETCH_FAILED, MAX_PAGE_BYTES,
+    _ByteBudget, _is_public_url, canonicalize_url, cache_content, fetch_page, get_cached_content
+)
+
+
+class _TestHandler(BaseHTTPRequestHandler):
+    """Local pages that exercise the byte, time and redirect limits of fetch_page"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_html_headers(self, length=None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if length is not None:
+            self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+    def _redirect(self, location):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.end_headers()
+
+    def do_GET(self):
+        try:
+            if self.path == '/page':
+                body = b'<html><body><p>Hello</p></body></html>'
+                self._send_html_headers(len(body))
+                self.wfile.write(body)
+            elif self.path == '/big':
+                body = b'x' * (MAX_PAGE_BYTES * 2)
+                self._send_html_headers(len(body))
+                self.wfile.write(body)
+            elif self.path == '/drip':
+                self._send_html_headers()
+                for _ in range(100):
+                    self.wfile.write(b'<p>x</p>')
+                    time.sleep(0.1)
+            elif self.path == '/slow':
+                time.sleep(2)
+                self._send_html_headers(0)
+            elif self.path == '/text':
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain')
+                self.end_headers()
+            elif self.path == '/redirect':
+                self._redirect('/page')
+            elif self.path == '/loop':
+                self._redirect('/loop')
+            elif self.path == '/internal':
+                self._redirect('http://10.0.0.1/')
+            else:
+                self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _TestHandler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def allow_test_server(server, monkeypatch):
+    """Let fetch_page reach the loopback test server; every other URL gets the real check"""
+    real_check = content_enricher._is_public_url
+    monkeypatch.setattr(content_enricher, '_is_public_url',
+                        lambda url: url.startswith(server + '/') or real_check(url))
+    content_enricher.content_cache.clear()
+    yield
+    content_enricher.content_cache.clear()
+
+
+def _fetch(url, budget=5, byte_budget=None):
+    deadline = time.monotonic() + budget
+    return fetch_page(url, deadline, byte_budget or _ByteBudget(content_enricher.MAX_TOTAL_BYTES))
+
+
+def test_canonicalize_url_drops_tracking_params_and_sorts():
+    url = 'https://Example.com/a?b=2&utm_source=x&a=1&fbclid=y#frag'
+    assert canonicalize_url(url) == 'https://example.com/a?a=1&b=2'
+
+
+def test_canonicalize_url_drops_default_ports_only():
+    assert canonicalize_url('http://example.com:80/') == 'http://example.com/'
+    assert canonicalize_url('https://example.com:443') == 'https://example.com/'
+    assert canonicalize_url('https://example.com:8443/x') == 'https://example.com:8443/x'
+
+
+def test_cached_content_expires_after_ttl():
+    cache_content('https://example.com/', 'text')
+    assert get_cached_content('https://example.com/') == (True, 'text')
+
+    content_enricher.content_cache['https://example.com/']['timestamp'] -= content_enricher.CONTENT_CACHE_TTL + 1
+    assert get_cached_content('https://example.com/') == (False, None)
+
+
+def test_failed_pages_use_negative_ttl():
+    cache_content('https://example.com/', None)
+    assert get_cached_content('https://example.com/') == (True, None)
+
+    content_enricher.content_cache['https://example.com/']['timestamp'] -= content_enricher.NEGATIVE_CACHE_TTL + 1
+    assert get_cached_content('https://example.com/') == (False, None)
+
+
+def test_byte_budget_grants_up_to_remaining():
+    budget = _ByteBudget(10)
+    assert budget.take(4) == 4
+    assert budget.take(10) == 6
+    assert budget.take(1) == 0
+
+
+def test_is_public_url_rejects_internal_hosts_and_schemes():
+    for url in ('http://127.0.0.1/', 'http://10.0.0.1/', 'http://169.254.169.254/latest/',
+                'http://[::1]/', 'ftp://93.184.216.34/', 'http://[bad'):
+        assert not _is_public_url(url), url
+    assert _is_public_url('http://93.184.216.34/')
+
+
+def test_fetch_page_reads_small_page(server):
+    html, status = _fetch(server + '/page')
+    assert status == FETCH_COMPLETE
+    assert b'Hello' in html
+
+
+def test_fetch_page_stops_at_page_byte_cap(server):
+    html, status = _fetch(server + '/big')
+    assert status == FETCH_COMPLETE
+    assert len(html) == MAX_PAGE_BYTES
+
+
+def test_fetch_page_stops_at_run_byte_budget(server):
+    html, status = _fetch(server + '/big', byte_budget=_ByteBudget(1000))
+    assert status == FETCH_INCOMPLETE
+    assert len(html) == 1000
+
+
+def test_fetch_page_stops_dripping_page_at_deadline(server):
+    start = time.monotonic()
+    html, status = _fetch(server + '/drip', budget=1)
+    assert status == FETCH_INCOMPLETE
+    assert html
+    assert time.monotonic() - start < 1 + content_enricher.READ_TIMEOUT
+
+
+def test_fetch_page_timeout_at_deadline_is_incomplete(server):
+    html, status = _fetch(server + '/slow', budget=0.5)
+    assert (html, status) == (None, FETCH_INCOMPLETE)
+
+
+def test_fetch_page_follows_redirects(server):
+    html, status = _fetch(server + '/redirect')
+    assert status == FETCH_COMPLETE
+    assert b'Hello' in html
+
+
+def test_fetch_page_gives_up_on_redirect_loop(server):
+    assert _fetch(server + '/loop') == (None, FETCH_FAILED)
+
+
+def test_fetch_page_refuses_redirect_to_internal_host(server):
+    assert _fetch(server + '/internal') == (None, FETCH_FAILED)
+
+
+def test_fetch_page_rejects_non_html_and_errors(server):
+    assert _fetch(server + '/text') == (None, FETCH_FAILED)
+    assert _fetch(server + '/missing') == (None, FETCH_FAILED)
+
+
+def test_budget_truncated_pages_are_not_cached(server):
+    url = server + '/drip'
+    content_enricher._fetch_and_extract(url, url, time.monotonic() + 0.5, _ByteBudget(MAX_PAGE_BYTES))
+    assert get_cached_content(url) == (False, None)
+
+
+def test_failed_pages_are_negative_cached(server):
+    url = server + '/missing'
+    content_enricher._fetch_and_extract(url, url, time.monotonic() + 5, _ByteBudget(MAX_PAGE_BYTES))
+    assert get_cached_content(url) == (True, None)
+    assert content_enricher.content_cache[url]['ttl'] == content_enricher.NEGATIVE_CACHE_TTL